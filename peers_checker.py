@@ -8,86 +8,208 @@ It compares the block heights of peers against the expected block height from a
 
 Script inspired by https://github.com/bluefishismesu/bluefishismevd_initia/
 
-Parameters:
-1. rpc_url (str): The RPC URL to fetch the expected block height.
-2. get_peers_from_file (str): Path to the file containing peers. If not present, peers are fetched from the RPC URL.
-3. top_n (int): Number of top peers to save based on block height.
-4. output_filename (str): The filename to save the top peers.
-5. json_format (bool, optional, default=False): Save peers information in JSON format (include moniker, node_id, ip, port, full_peer, latency).
-6. accepted_height_difference (int): Accepted difference between the expected height and the actual peer height.
-7. max_latency (int, optional): Maximum latency to filter peers.
+Arguments:
+rpc_url (positional): The RPC URL to fetch the expected block height (and the peer list,
+    unless --peers-file is given).
+
+Options (see --help for the full list):
+--peers-file PATH (default=fetch from RPC): Path to the file containing peers.
+--top-n N (int, default=40): Number of top peers to save based on block height.
+--output-filename PATH (default=top_peers.txt): The filename to save the top peers.
+--json-format: Also save peers information in JSON format (moniker, node_id, ip, port, full_peer, latency).
+--accepted-height-difference N (int, default=100): Accepted difference between the expected height
+    and the actual peer height.
+--max-latency MS (int, default=unlimited): Maximum latency to filter peers.
+--concurrency N (int, default=200): Maximum number of peers probed at the same time.
+    Each in-flight probe holds an open socket, so keep N below the process file-descriptor
+    limit (`ulimit -n`).
+--connect-timeout S (float, default=2): Seconds to wait for a TCP connection to a peer.
+--read-timeout S (float, default=1): Seconds to wait for a peer's /status response.
+--rpc-timeout S (float, default=2): Seconds to wait for the main RPC endpoint.
+--cache-ttl S (float, default=5): Seconds during which the expected height and peer list
+    from a previous run are reused from ~/.cache/peers_checker instead of re-querying the RPC.
+    Set to 0 to disable caching.
+--oversample N (int, default=3): Stop probing once top_n * N matching peers are found
+    instead of waiting for every probe to finish. Set to 0 to always probe all peers.
 
 Example usage:
-    python3 peers_checker.py https://rpc-initia.01node.com "" 30 top_peers.txt True 100 50
-    python3 peers_checker.py https://rpc-initia.01node.com peers.txt 30 top_peers.txt True 100 50
+    python3 peers_checker.py https://rpc-initia.01node.com --top-n 30 --json-format --max-latency 50
+    python3 peers_checker.py https://rpc-initia.01node.com --peers-file peers.txt --top-n 30 --json-format
+    python3 peers_checker.py https://rpc-initia.01node.com --top-n 30 --concurrency 500
 
 Additional behavior:
 - The script creates another file with the name "output_filename"_ids_only.txt that contains only peers' IDs in the format id,id,id,id...
 """
 
-import socket
+import argparse
+import asyncio
+import hashlib
+import heapq
+import os
 import time
 import logging
-import requests
+import aiohttp
 import sys
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from operator import attrgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "peers_checker")
 
-def check_connection(ip, port, timeout=2):
-    start_time = time.time()
+
+@dataclass(slots=True)
+class Peer:
+    line: str
+    height: int
+    node_id: str
+    moniker: str
+    ip: str
+    port: int
+    latency: int
+
+
+def cache_path(name, rpc_url):
+    return os.path.join(CACHE_DIR, f"{name}_{hashlib.sha256(rpc_url.encode()).hexdigest()[:16]}.json")
+
+
+def load_cached(name, rpc_url, ttl):
+    if ttl <= 0:
+        return None
     try:
-        with socket.create_connection((ip, port), timeout):
-            end_time = time.time()
-            return True, (end_time - start_time) * 1000  # Convert to milliseconds
-    except (socket.timeout, socket.error):
-        return False, None
+        with open(cache_path(name, rpc_url), 'r') as file:
+            entry = json.load(file)
+        if time.time() - entry["ts"] < ttl:
+            return entry["value"]
+    except (IOError, ValueError, KeyError):
+        pass
+    return None
 
 
-def get_latest_block_height(ip, rpc_port):
+def save_cached(name, rpc_url, value):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path(name, rpc_url), 'w') as file:
+            json.dump({"ts": time.time(), "value": value}, file)
+    except IOError as e:
+        logging.debug(f"Failed to write cache entry {name}: {e}")
+
+
+async def read_json(response):
+    body = await response.read()
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+async def get_json_with_retry(session, url, timeout, retries=2, backoff=0.2):
+    # Returns (result, latency_ms). Latency covers only the successful attempt,
+    # so failed attempts and backoff sleeps are not counted against the peer.
+    for attempt in range(retries + 1):
+        try:
+            start_time = time.perf_counter()
+            async with session.get(url, timeout=timeout) as response:
+                if response.status == 200:
+                    result = await read_json(response)
+                    latency = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
+                    return result, latency
+                if response.status < 500:  # only 5xx responses are worth retrying
+                    return None, None
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+    return None, None
+
+
+async def get_latest_block_height(session, ip, rpc_port, connect_timeout=2, read_timeout=1):
     url_http = f"http://{ip}:{rpc_port}/status"
+    timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
     try:
-        response = requests.get(url_http, timeout=1)
-        if response.status_code == 200:
-            result = response.json()
+        result, latency = await get_json_with_retry(session, url_http, timeout)
+        if result is not None:
             latest_block_height = int(result["result"]["sync_info"]["latest_block_height"])
             moniker = result["result"]["node_info"]["moniker"]
             node_id = result["result"]["node_info"]["id"]
-            return latest_block_height, moniker, node_id
-    except requests.RequestException:
+            return latest_block_height, moniker, node_id, latency
+    except (aiohttp.ClientError, asyncio.TimeoutError):
         pass
-    return None, "", ""
+    return None, "", "", None
 
 
-def fetch_expected_height(rpc_url):
+async def fetch_expected_height(session, rpc_url, rpc_timeout=2, cache_ttl=5):
+    cached = load_cached("expected_height", rpc_url, cache_ttl)
+    if cached is not None:
+        logging.info(f"Expected block height loaded from cache for {rpc_url}: {cached}")
+        return cached
     try:
-        response = requests.get(f"{rpc_url}/status", timeout=2)
-        if response.status_code == 200:
-            result = response.json()
+        result, _ = await get_json_with_retry(session, f"{rpc_url}/status", aiohttp.ClientTimeout(total=rpc_timeout))
+        if result is not None:
             expected_height = int(result["result"]["sync_info"]["latest_block_height"])
             logging.info(f"Expected block height fetched from {rpc_url}: {expected_height}")
+            save_cached("expected_height", rpc_url, expected_height)
             return expected_height
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logging.error(f"Failed to fetch expected height from {rpc_url}: {e}")
     return None
 
 
-def fetch_peers(rpc_url):
+async def fetch_peers(session, rpc_url, rpc_timeout=2, cache_ttl=5):
+    cached = load_cached("peers", rpc_url, cache_ttl)
+    if cached is not None:
+        logging.info(f"Peer list loaded from cache for {rpc_url} ({len(cached)} peers)")
+        return cached
     try:
-        response = requests.get(f"{rpc_url}/net_info", timeout=2)
-        if response.status_code == 200:
-            result = response.json()
+        result, _ = await get_json_with_retry(session, f"{rpc_url}/net_info", aiohttp.ClientTimeout(total=rpc_timeout))
+        if result is not None:
             peers = result["result"]["peers"]
-            return [f"{peer['node_info']['id']}@{peer['remote_ip']}:{peer['node_info']['listen_addr'].split(':')[-1]}"
-                    for peer in peers]
-    except requests.RequestException as e:
+            peer_lines = [f"{peer['node_info']['id']}@{peer['remote_ip']}:{peer['node_info']['listen_addr'].split(':')[-1]}"
+                          for peer in peers]
+            save_cached("peers", rpc_url, peer_lines)
+            return peer_lines
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logging.error(f"Failed to fetch peers from {rpc_url}: {e}")
     return []
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Check peer block heights against the expected height from an RPC endpoint.")
+    parser.add_argument('rpc_url',
+                        help="RPC URL to fetch the expected block height (and the peer list, unless --peers-file is given)")
+    parser.add_argument('--peers-file', default='',
+                        help="path to the file containing peers; when omitted, peers are fetched from the RPC URL")
+    parser.add_argument('--top-n', type=int, default=40,
+                        help="number of top peers to save based on block height (default: %(default)s)")
+    parser.add_argument('--output-filename', default='top_peers.txt',
+                        help="filename to save the top peers (default: %(default)s)")
+    parser.add_argument('--json-format', action='store_true',
+                        help="also save peer information in JSON format")
+    parser.add_argument('--accepted-height-difference', type=int, default=100,
+                        help="accepted difference between the expected and actual peer height (default: %(default)s)")
+    parser.add_argument('--max-latency', type=int, default=None,
+                        help="maximum latency in ms to filter peers (default: unlimited)")
+    parser.add_argument('--concurrency', type=int, default=200,
+                        help="maximum number of peers probed at the same time (default: %(default)s)")
+    parser.add_argument('--connect-timeout', type=float, default=2,
+                        help="seconds to wait for a TCP connection to a peer (default: %(default)s)")
+    parser.add_argument('--read-timeout', type=float, default=1,
+                        help="seconds to wait for a peer's /status response (default: %(default)s)")
+    parser.add_argument('--rpc-timeout', type=float, default=2,
+                        help="seconds to wait for the main RPC endpoint (default: %(default)s)")
+    parser.add_argument('--cache-ttl', type=float, default=5,
+                        help="seconds to reuse the cached expected height and peer list; 0 disables (default: %(default)s)")
+    parser.add_argument('--oversample', type=int, default=3,
+                        help="stop probing once top_n * N matching peers are found; 0 probes all peers (default: %(default)s)")
+    return parser.parse_args()
+
+
 def parse_file(file_path):
     try:
         with open(file_path, 'r') as file:
@@ -98,106 +220,130 @@ def parse_file(file_path):
         return []
 
 
-def check_nodes(lines, expected_height, max_latency, accepted_height_difference):
-    successful_connections = []
-    moniker_info = []
-    total_lines = len(lines)
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_ip_port = {
-            executor.submit(process_line, line, expected_height, max_latency, accepted_height_difference): line for line in lines
-        }
-
-        processed_count = 0
-        for future in as_completed(future_to_ip_port):
-            line = future_to_ip_port[future]
+def parse_peers(lines):
+    peers = []
+    seen = set()
+    duplicates = 0
+    for line in lines:
+        parts = line.split('@')
+        if len(parts) == 2:
+            ip_port = parts[1].split(':')
+            if len(ip_port) == 2 and ip_port[1].isdigit():
+                ip, port = ip_port[0], int(ip_port[1])
+                if (ip, port) in seen:
+                    duplicates += 1
+                else:
+                    seen.add((ip, port))
+                    peers.append((parts[0], ip, port))
+                continue
+        logging.warning(f"Skipping malformed peer entry: {line}")
+    if duplicates:
+        logging.info(f"Skipped {duplicates} duplicate peer entries.")
+    return peers
+
+
+async def check_nodes(session, peer_records, expected_height, max_latency, accepted_height_difference, concurrency=200,
+                      connect_timeout=2, read_timeout=1, top_n=None, oversample=3):
+    peers = []
+    total_records = len(peer_records)
+    semaphore = asyncio.Semaphore(concurrency)
+    enough = top_n * oversample if top_n and oversample else None
+
+    async def bounded_process_peer(node_id, ip, port):
+        async with semaphore:
             try:
-                result = future.result()
-                if result:
-                    successful_connections.append((result[0], result[1], result[2]))
-                    moniker_info.append(result[2])
-                processed_count += 1
-                logging.info(f"Processed {processed_count}/{total_lines} entries.")
+                return await process_peer(session, node_id, ip, port, expected_height, max_latency,
+                                          accepted_height_difference, connect_timeout, read_timeout)
             except Exception as e:
-                logging.error(f"Error processing line {line}: {e}")
-    return successful_connections, moniker_info
-
-
-def process_line(line, expected_height, max_latency, accepted_height_difference):
-    parts = line.split('@')
-    if len(parts) == 2:
-        ip_port = parts[1].split(':')
-        if len(ip_port) == 2:
-            ip = ip_port[0]
-            port = int(ip_port[1])
-            success, latency = check_connection(ip, port)
-            if success and (max_latency is None or latency <= max_latency):
-                block_height, moniker, node_id = get_latest_block_height(ip, port + 1)
-                if block_height is not None:
-                    if abs(block_height - expected_height) <= accepted_height_difference:
-                        logging.info(
-                            f"block_height {moniker} {ip}:{port} with {block_height} height and {int(latency)} ms latency")
-                        moniker_info = {
-                            "moniker": moniker,
-                            "node_id": node_id,
-                            "ip": ip,
-                            "port": port,
-                            "full_peer": f"{node_id}@{ip}:{port}",
-                            "latency": int(latency)
-                        }
-                        return line, block_height, moniker_info
+                logging.error(f"Error processing peer {node_id}@{ip}:{port}: {e}")
+                return None
+
+    tasks = [asyncio.ensure_future(bounded_process_peer(node_id, ip, port)) for node_id, ip, port in peer_records]
+
+    processed_count = 0
+    progress_every = max(1, total_records // 20)
+    for future in asyncio.as_completed(tasks):
+        result = await future
+        if result:
+            peers.append(result)
+        processed_count += 1
+        if processed_count % progress_every == 0 or processed_count == total_records:
+            logging.info(f"Processed {processed_count}/{total_records} entries.")
+        if enough is not None and len(peers) >= enough:
+            logging.info(f"Found {len(peers)} matching peers; cancelling remaining probes.")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            break
+    return peers
+
+
+async def process_peer(session, node_id, ip, port, expected_height, max_latency, accepted_height_difference,
+                       connect_timeout=2, read_timeout=1):
+    block_height, moniker, status_node_id, latency = await get_latest_block_height(session, ip, port + 1,
+                                                                                   connect_timeout, read_timeout)
+    if block_height is not None and (max_latency is None or latency <= max_latency):
+        if abs(block_height - expected_height) <= accepted_height_difference:
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(
+                    f"block_height {moniker} {ip}:{port} with {block_height} height and {int(latency)} ms latency")
+            return Peer(line=f"{node_id}@{ip}:{port}", height=block_height, node_id=status_node_id or node_id,
+                        moniker=moniker, ip=ip, port=port, latency=int(latency))
     return None
 
 
-def save_top_connections(connections, output_filename, top_n=40):
-    connections.sort(key=lambda x: x[1], reverse=True)
-    top_connections = connections[:top_n]
+def save_top_connections(peers, output_filename, top_n=40):
+    top_peers = heapq.nlargest(top_n, peers, key=attrgetter('height'))
+    for peer in top_peers:
+        logging.info(f"Connection: {peer.line}, Block Height: {peer.height}, Latency: {peer.latency} ms")
     with open(output_filename, 'w') as file:
-        first_entry = True
-        for conn in top_connections:
-            logging.info(f"Connection: {conn[0]}, Block Height: {conn[1]}, Latency: {conn[2]['latency']} ms")
-            if first_entry:
-                file.write(conn[0])
-                first_entry = False
-            else:
-                file.write(',' + conn[0])
+        file.write(','.join(peer.line for peer in top_peers))
     logging.info(f"Saved top {top_n} connections to {output_filename}.")
-    save_ids_only(top_connections, output_filename)
-    return len(top_connections)
+    save_ids_only(top_peers, output_filename)
+    return len(top_peers)
 
 
-def save_ids_only(connections, output_filename):
+def save_ids_only(peers, output_filename):
     ids_only_filename = output_filename.replace('.txt', '_ids_only.txt')
     with open(ids_only_filename, 'w') as file:
-        first_entry = True
-        for conn in connections:
-            if first_entry:
-                file.write(conn[2]['node_id'])
-                first_entry = False
-            else:
-                file.write(',' + conn[2]['node_id'])
+        file.write(','.join(peer.node_id for peer in peers))
     logging.info(f"Saved peer IDs to {ids_only_filename}.")
 
 
-def save_moniker_info(moniker_info, output_filename):
+def save_moniker_info(peers, output_filename):
+    moniker_info = [{
+        "moniker": peer.moniker,
+        "node_id": peer.node_id,
+        "ip": peer.ip,
+        "port": peer.port,
+        "full_peer": f"{peer.node_id}@{peer.ip}:{peer.port}",
+        "latency": peer.latency
+    } for peer in peers]
     with open(output_filename, 'w') as file:
         json.dump(moniker_info, file, indent=4)
     logging.info(f"Saved moniker information to {output_filename}.")
 
 
-# Main script execution
-if __name__ == "__main__":
-    try:
-        start_time = time.time()
-        rpc_url = sys.argv[1]
-        get_peers_from_file = sys.argv[2]
-        top_n = int(sys.argv[3])
-        output_filename = sys.argv[4]
-        json_format = sys.argv[5].lower() == 'true'
-        accepted_height_difference = int(sys.argv[6])
-        max_latency = int(sys.argv[7]) if len(sys.argv) > 7 else None
-
-        expected_height = fetch_expected_height(rpc_url)
+async def main():
+    start_time = time.time()
+    args = parse_args()
+    rpc_url = args.rpc_url
+    get_peers_from_file = args.peers_file
+    top_n = args.top_n
+    output_filename = args.output_filename
+    json_format = args.json_format
+    accepted_height_difference = args.accepted_height_difference
+    max_latency = args.max_latency
+    concurrency = args.concurrency
+    connect_timeout = args.connect_timeout
+    read_timeout = args.read_timeout
+    rpc_timeout = args.rpc_timeout
+    cache_ttl = args.cache_ttl
+    oversample = args.oversample
+
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        expected_height = await fetch_expected_height(session, rpc_url, rpc_timeout, cache_ttl)
         if expected_height is None:
             logging.error("Failed to fetch expected block height. Exiting.")
             sys.exit(1)
@@ -211,28 +357,41 @@ if __name__ == "__main__":
                 sys.exit(1)
             peers_source = get_peers_from_file
         else:
-            lines = fetch_peers(rpc_url)
+            lines = await fetch_peers(session, rpc_url, rpc_timeout, cache_ttl)
             if not lines:
                 logging.error(f"Failed to fetch peers from RPC {rpc_url}. Exiting.")
                 sys.exit(1)
             peers_source = f"{rpc_url}/net_info"
 
-        connections, moniker_info = check_nodes(lines, expected_height, max_latency, accepted_height_difference)
+        peer_records = parse_peers(lines)
+        if not peer_records:
+            logging.error("No valid peer entries to check. Exiting.")
+            sys.exit(1)
 
-        matched_nodes = len(connections)
-        saved_nodes = save_top_connections(connections, output_filename, top_n)
+        peers = await check_nodes(
+            session, peer_records, expected_height, max_latency, accepted_height_difference, concurrency,
+            connect_timeout, read_timeout, top_n, oversample)
 
-        if json_format:
-            moniker_output_filename = output_filename.replace('.txt', '_moniker_objs.json')
-            save_moniker_info(moniker_info, moniker_output_filename)
+    matched_nodes = len(peers)
+    saved_nodes = await asyncio.to_thread(save_top_connections, peers, output_filename, top_n)
 
-        end_time = time.time()
-        total_time = end_time - start_time
+    if json_format:
+        moniker_output_filename = output_filename.replace('.txt', '_moniker_objs.json')
+        await asyncio.to_thread(save_moniker_info, peers, moniker_output_filename)
 
-        logging.info(f"Script run time: {total_time:.2f} seconds")
-        logging.info(f"Total nodes matched: {matched_nodes}")
-        logging.info(f"Total nodes saved: {saved_nodes}")
-        logging.info(f"Peers were fetched from: {peers_source}")
-        logging.info("Processing completed successfully.")
+    end_time = time.time()
+    total_time = end_time - start_time
+
+    logging.info(f"Script run time: {total_time:.2f} seconds")
+    logging.info(f"Total nodes matched: {matched_nodes}")
+    logging.info(f"Total nodes saved: {saved_nodes}")
+    logging.info(f"Peers were fetched from: {peers_source}")
+    logging.info("Processing completed successfully.")
+
+
+# Main script execution
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
     except Exception as e:
         logging.error(f"An error occurred: {e}")